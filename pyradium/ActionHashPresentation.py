@@ -21,6 +21,7 @@
 
 import os
 import logging
+import hashlib
 from .BaseAction import BaseAction
 from .RenderingParameters import RenderingParameters
 from .Presentation import Presentation
@@ -45,7 +46,9 @@ class ActionHashPresentation(BaseAction):
 		for directive in presentation.content:
 			self._handle_directive(directive)
 
-		hash_value = HashTools.hash_files(self._dependencies)
+		# The hash is meant to be stored in order to detect modifications, so
+		# keep it independent of the (faster) hash used for internal caching
+		hash_value = HashTools.hash_files(self._dependencies, hash_function = hashlib.md5)
 		print(hash_value)
 
 	def _add_dependency(self, relative_filename):
@@ -20,4 +20,4 @@
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
 class BaseDirective():
-	pass
+	__slots__ = ( )
@@ -27,19 +27,30 @@ import base64
 class ExtendedJSONObjects(enum.Enum):
 	UncompressedBytes = "6bbc5f9e-6aba-40f4-878c-1ce5f5f50055"
 	ZLibCompressedBytes = "f12d83b4-b2dd-4968-8f14-e063970c66fd"
+	BlobReference = "ded031f0-f72e-4a3f-b65b-5c3e57fc9a36"
 
 class ExtendedJSONEncoder(json.JSONEncoder):
-	def default(self, obj):
-		if isinstance(obj, bytes):
-			if len(obj) > 1000:
-				# Try to compress first
-				compressed = zlib.compress(obj)
+	@staticmethod
+	def compress_bytes(obj):
+		# Returns the zlib compressed data or None if compression is not worth
+		# it
+		if len(obj) <= 1000:
+			return None
+
+		# Try to compress first
+		compressed = zlib.compress(obj)
 
-				# Evaluate if it was worth it
-				saved_size_bytes = len(obj) - len(compressed)
-				saved_size_percent = 100 * saved_size_bytes / len(obj)
+		# Evaluate if it was worth it
+		saved_size_bytes = len(obj) - len(compressed)
+		saved_size_percent = 100 * saved_size_bytes / len(obj)
+		if (saved_size_bytes < 1000) or (saved_size_percent < 1):
+			return None
+		return compressed
 
-			if (len(obj) <= 1000) or (saved_size_bytes < 1000) or (saved_size_percent < 1):
+	def default(self, obj):
+		if isinstance(obj, bytes):
+			compressed = self.compress_bytes(obj)
+			if compressed is None:
 				# Save raw, not worth it.
 				return {
 					"__internal_object__":	ExtendedJSONObjects.UncompressedBytes.value,
@@ -62,6 +73,9 @@ class ExtendedJSONEncoder(json.JSONEncoder):
 				return base64.b64decode(obj["data"])
 			elif obj_type == ExtendedJSONObjects.ZLibCompressedBytes:
 				return zlib.decompress(base64.b64decode(obj["data"]))
+			elif obj_type == ExtendedJSONObjects.BlobReference:
+				# Resolved by the user of the external blob (e.g., RendererCache)
+				return obj
 			else:
 				raise NotImplementedError(obj_type)
 		else:
@@ -28,13 +28,19 @@ class FileLookup():
 			self._paths = tuple()
 		else:
 			self._paths = tuple(paths)
+		self._lookup_cache = { }
 
 	def lookup(self, filename):
+		# Only successful lookups are remembered: files may still be created
+		# during rendering (e.g., by an s:exec command) and must then be found
+		if filename in self._lookup_cache:
+			return self._lookup_cache[filename]
 		for dirname in self._paths:
 			if not dirname.endswith("/"):
 				dirname += "/"
 			path = dirname + filename
 			if os.path.isfile(path):
+				self._lookup_cache[filename] = path
 				return path
 		if len(self._paths) == 0:
 			raise FailedToLookupFileException(f"No such file: {filename} (no directories given to look up)")
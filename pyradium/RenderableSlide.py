@@ -19,25 +19,22 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
+import dataclasses
 from .Tools import XMLTools
 
+@dataclasses.dataclass(slots = True, frozen = True, eq = False)
 class RenderableSlide():
-	def __init__(self, slide_type, content_containers, slide_vars):
-		self._slide_type = slide_type
-		self._content_containers = content_containers
-		self._slide_vars = slide_vars
-
-	@property
-	def slide_type(self):
-		return self._slide_type
+	slide_type: str
+	content_containers: dict | None
+	slide_vars: dict
 
 	def var(self, name, default_value = None):
-		return self._slide_vars.get(name, default_value)
+		return self.slide_vars.get(name, default_value)
 
 	def has(self, name):
-		return name in self._slide_vars
+		return name in self.slide_vars
 
 	def content(self, key = None):
 		if key is None:
 			key = "default"
-		return XMLTools.inner_toxml(self._content_containers.get(key))
+		return XMLTools.inner_toxml(self.content_containers.get(key))
@@ -20,14 +20,20 @@
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
 import os
-import shutil
+import mmap
 import contextlib
+import shutil
+import xxhash
 from .GenericTOC import GenericTOC
 from .OrderedSet import OrderedSet
 from .Schedule import PresentationSchedule, TimeSpecification
 from .Enums import PresentationFeature
 
 class RenderedPresentation():
+	# Below this size, hashing the content to find duplicates costs more than
+	# simply writing the file again
+	_DEDUPLICATION_MIN_SIZE = 1024
+
 	def __init__(self, renderer, deploy_directory, resource_directory):
 		self._renderer = renderer
 		self._deploy_directory = deploy_directory
@@ -38,11 +44,14 @@ class RenderedPresentation():
 		self._toc = GenericTOC()
 		self._frozen_toc = None
 		self._added_files = set()
+		self._content_hashes = { }
+		self._created_directories = set()
 		self._current_slide_number = 0
 		self._total_slide_count = 0
 		self._uid = 0
 		self._features = set()
 		self._markers = { }
+		self._memos = { }
 
 		time_range = self._renderer.presentation.meta.get("presentation-time")
 		if time_range is None:
@@ -87,6 +96,10 @@ class RenderedPresentation():
 	def rendered_slides(self):
 		return iter(self._rendered_slides)
 
+	@property
+	def combined_slides(self):
+		return "\n".join(self._rendered_slides)
+
 	@property
 	def js(self):
 		return iter(self._js)
@@ -137,20 +150,86 @@ class RenderedPresentation():
 	def markers(self):
 		return self._markers
 
+	def get_memo(self, name):
+		# Memoization storage that lives as long as this rendering, e.g., for
+		# hooks that handle the same objects in every slide pass
+		return self._memos.setdefault(name, { })
+
 	def append_slide(self, rendered_slide):
 		self._rendered_slides.append(rendered_slide)
 
-	def add_file(self, destination_relpath, content, target_directory = "/", to_deployment_dir = False):
+	def _makedirs(self, dirname):
+		if dirname not in self._created_directories:
+			os.makedirs(dirname, exist_ok = True)
+			self._created_directories.add(dirname)
+
+	def _claim_destination(self, destination_relpath, target_directory, to_deployment_dir):
+		# Returns the absolute destination filename with its directory already
+		# created or None if the file has been added before.
 		assert(target_directory.startswith("/"))
 		assert(target_directory.endswith("/"))
 		if destination_relpath in self._added_files:
-			return
+			return None
 		self._added_files.add(destination_relpath)
 		directory = self._deploy_directory if to_deployment_dir else self._resource_directory
 		filename = directory + target_directory + destination_relpath
-		dirname = os.path.dirname(filename)
-		with contextlib.suppress(FileExistsError):
-			os.makedirs(dirname)
+		self._makedirs(os.path.dirname(filename))
+		return filename
+
+	@staticmethod
+	def _unshare(filename):
+		# A previous render into the same directory may have hardlinked this
+		# file; overwriting it in-place would then also modify its siblings.
+		try:
+			if os.stat(filename).st_nlink > 1:
+				os.unlink(filename)
+		except FileNotFoundError:
+			pass
+
+	@staticmethod
+	def _has_content(filename, content):
+		with memoryview(content) as view, open(filename, "rb") as f:
+			offset = 0
+			while True:
+				chunk = f.read(1024 * 1024)
+				if len(chunk) == 0:
+					return offset == len(view)
+				if view[offset : offset + len(chunk)] != chunk:
+					return False
+				offset += len(chunk)
+
+	def _link_duplicate(self, filename, content):
+		# Returns True if identical content has already been written and the
+		# file could be hardlinked to it. Otherwise, the content is remembered
+		# and the caller has to write the file.
+		content_key = (len(content), xxhash.xxh128_intdigest(content))
+		first_filename = self._content_hashes.get(content_key)
+		if first_filename is None:
+			self._content_hashes[content_key] = filename
+			return False
+		try:
+			# Never trust the hash alone, a collision would otherwise serve the
+			# wrong content
+			if not self._has_content(first_filename, content):
+				return False
+			with contextlib.suppress(FileNotFoundError):
+				os.unlink(filename)
+			os.link(first_filename, filename)
+			return True
+		except OSError:
+			# E.g., resource and deployment directory are on different file
+			# systems, the file system does not support hardlinks or the first
+			# file has vanished
+			return False
+
+	def add_file(self, destination_relpath, content, target_directory = "/", to_deployment_dir = False):
+		filename = self._claim_destination(destination_relpath, target_directory, to_deployment_dir)
+		if filename is None:
+			return
+		if isinstance(content, bytes) and (len(content) >= self._DEDUPLICATION_MIN_SIZE):
+			if self._link_duplicate(filename, content):
+				return
+		self._unshare(filename)
 		with open(filename, "w" if isinstance(content, str) else "wb") as f:
 			f.write(content)
 
@@ -158,14 +237,21 @@ class RenderedPresentation():
 		if rel_filename in self._added_files:
 			return
 		source_filename = self.renderer.lookup_template_file(rel_filename)
+		filename = self._claim_destination(rel_filename, target_directory, to_deployment_dir = False)
 		with open(source_filename, "rb") as f:
-			self.add_file(rel_filename, f.read(), target_directory)
+			if os.fstat(f.fileno()).st_size >= self._DEDUPLICATION_MIN_SIZE:
+				# Hash the memory mapped file without reading it into memory
+				with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as content:
+					if self._link_duplicate(filename, content):
+						return
+		self._unshare(filename)
+		# shutil.copyfile() copies in-kernel (sendfile) where the platform
+		# supports it instead of reading the whole file into memory
+		shutil.copyfile(source_filename, filename)
 
 	def copy_abs_file(self, src_abs_filename, dest_rel_filename):
 		dest_filename = f"{self._deploy_directory}/{dest_rel_filename}"
-		dest_directory = os.path.dirname(dest_filename)
-		with contextlib.suppress(FileExistsError):
-			os.makedirs(dest_directory)
+		self._makedirs(os.path.dirname(dest_filename))
 		shutil.copy(src_abs_filename, dest_filename)
 
 	def handle_dependencies(self, dependencies):
@@ -19,17 +19,20 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
+import os
 import json
+import subprocess
 import logging
-import mako.lookup
-import mako.exceptions
+import concurrent.futures
 import markupsafe
 import pyradium
 from pyradium.Controller import ControllerManager
 from pyradium.renderer import BaseRenderer
+from pyradium.RendererCache import RendererCache
+from pyradium.xmlhooks.XMLHookRegistry import XMLHookRegistry
 from .Acronyms import Acronyms
 from .RenderedPresentation import RenderedPresentation
-from .Exceptions import TemplateErrorException, MalformedStyleConfigurationException, UnknownSlideTypeException
+from .Exceptions import PyRadiumException, TemplateErrorException, MalformedStyleConfigurationException, UnknownSlideTypeException
 from .Slide import RenderSlideDirective
 from .Enums import PresentationFeature
 from .Tools import JSONTools
@@ -54,13 +57,20 @@ class Renderer():
 		self._presentation = presentation
 		self._rendering_params = rendering_params
 		self._custom_renderers = CustomRenderers()
-		self._lookup = mako.lookup.TemplateLookup(list(self._get_mako_lookup_directories()), strict_undefined = True, input_encoding = "utf-8", default_filters = [ "h" ])
+		# Mako is imported lazily since it accounts for a considerable part of
+		# the startup time, even of commands that never render anything
+		import mako.lookup
+		# Templates do not change during the lifetime of a renderer (a re-render
+		# creates a new one), so skip Mako's per-lookup modification checks
+		self._lookup = mako.lookup.TemplateLookup(list(self._get_mako_lookup_directories()), strict_undefined = True, input_encoding = "utf-8", default_filters = [ "h" ], filesystem_checks = False)
+		self._templates = { }
 		self._template_config_filename = self.lookup_styled_template_file("configuration.json")
 		with open(self._template_config_filename) as f:
 			self._template_config = json.load(f)
 		self._plausibilize_template_config()
 		self._ctrlr_mgr = ControllerManager(self)
 		self._style_parameters = self._parse_style_parameters()
+		self._template_args = self._get_constant_template_args()
 
 	def _plausibilize_template_config(self):
 		for feature_name in self._template_config.get("dependencies", { }).get("feature", { }):
@@ -116,22 +126,95 @@ class Renderer():
 				slide_types.add(directive.slide_type)
 		return slide_types
 
+	def _prerender(self, rendered_presentation):
+		# Custom renderers (e.g., LaTeX formulas or images) spend most of their
+		# time waiting for external tools. Run all of them that are known in
+		# advance concurrently so that the cache is warm when the hooks are
+		# invoked serially during the slide passes.
+		if _log.isEnabledFor(logging.SINGLESTEP):
+			# Single-stepping renderers wait for the user on the terminal,
+			# which must not happen from several threads at once
+			_log.debug("Not prerendering in single-step mode")
+			return
+		pending = { }
+		for directive in self._presentation:
+			if not isinstance(directive, RenderSlideDirective):
+				continue
+			for (renderer_name, property_dict) in XMLHookRegistry.prerender_requests(rendered_presentation, directive.xmlnode):
+				renderer = self.get_custom_renderer(renderer_name)
+				if (not isinstance(renderer, RendererCache)) or (not property_dict.get("cache", True)):
+					continue
+				try:
+					keyhash = renderer.keyhash(property_dict)
+				except (OSError, PyRadiumException):
+					continue
+				if renderer.contains(keyhash):
+					# Already cached (e.g., when re-rendering an unchanged
+					# presentation), nothing to do
+					continue
+				# Deduplicate so that no two workers write the same cache entry
+				pending.setdefault(renderer_name, { }).setdefault(keyhash, property_dict)
+
+		if len(pending) == 0:
+			return
+		worker_count = os.cpu_count() or 1
+		work_items = [ ]
+		for (renderer_name, property_dicts) in pending.items():
+			renderer = self.get_custom_renderer(renderer_name)
+			property_dicts = list(property_dicts.values())
+			_log.debug("Prerendering %d object(s) using the %s renderer", len(property_dicts), renderer_name)
+			if renderer.batched:
+				# Amortize the tool startup cost by rendering in batches, but
+				# still keep all workers busy
+				batch_count = min(worker_count, len(property_dicts))
+				work_items += [ (renderer, property_dicts[i :: batch_count]) for i in range(batch_count) ]
+			else:
+				work_items += [ (renderer, [ property_dict ]) for property_dict in property_dicts ]
+
+		executor = concurrent.futures.ThreadPoolExecutor(max_workers = worker_count)
+		try:
+			futures = [ executor.submit(renderer.render_batch, property_dicts) for (renderer, property_dicts) in work_items ]
+			for future in futures:
+				try:
+					future.result()
+				except (PyRadiumException, subprocess.CalledProcessError, OSError) as e:
+					# Deferred: rendering errors (including missing external
+					# tools) are raised with proper context once the hook is
+					# actually handled. Anything else is a bug and is
+					# propagated.
+					_log.debug("Prerendering failed: [%s] %s", e.__class__.__name__, str(e))
+		except BaseException:
+			# Do not start any of the queued jobs when interrupted (e.g., by
+			# Ctrl-C), only wait for the ones that are already running
+			executor.shutdown(wait = True, cancel_futures = True)
+			raise
+		executor.shutdown(wait = True)
+
 	def _compute_renderable_slides(self, rendered_presentation):
 		renderable_slides = [ ]
 		for directive in self._presentation:
 			generator = directive.render(rendered_presentation)
 			if generator is not None:
-				renderable_slides += generator
+				renderable_slides.extend(generator)
 		return renderable_slides
 
-	def render_file(self, template_filename, rendered_presentation = None, additional_template_args = None):
+	def _get_template(self, template_filename):
+		if template_filename not in self._templates:
+			import mako.exceptions
+			try:
+				self._templates[template_filename] = self._lookup.get_template(template_filename)
+			except mako.exceptions.MakoException as e:
+				raise UnknownSlideTypeException("Could not retrieve template necessary to render slide type %s (searched in: %s)." % (template_filename, ":".join(self._get_mako_lookup_directories()))) from e
+		return self._templates[template_filename]
+
+	def _get_constant_template_args(self):
 		def _template_error(text):
 			raise TemplateErrorException(text)
 
 		def _jsonify(obj):
 			return markupsafe.Markup(json.dumps(JSONTools.round_dict_floats(obj), sort_keys = True, separators = (",", ":")))
 
-		template_args = {
+		return {
 			"pyradium_version":			pyradium.VERSION,
 			"renderer":					self,
 			"presentation":				self._presentation,
@@ -141,15 +224,17 @@ class Renderer():
 			"preuri_ds":				self.rendering_params.resource_uri if self.rendering_params.resource_uri.startswith("/") else ("./" + self.rendering_params.resource_uri),
 			"styleopt":					self._style_parameters,
 		}
+
+	def render_file(self, template_filename, rendered_presentation = None, additional_template_args = None):
+		# The constant arguments are only evaluated once per renderer, each
+		# template invocation merely adds its specific arguments
+		template_args = dict(self._template_args)
 		if rendered_presentation is not None:
 			template_args["rendered_presentation"] = rendered_presentation
 		if additional_template_args is not None:
 			template_args.update(additional_template_args)
 
-		try:
-			template = self._lookup.get_template(template_filename)
-		except mako.exceptions.MakoException as e:
-			raise UnknownSlideTypeException("Could not retrieve template necessary to render slide type %s (searched in: %s)." % (template_filename, ":".join(self._get_mako_lookup_directories()))) from e
+		template = self._get_template(template_filename)
 		result = template.render(**template_args)
 		return result
 
@@ -162,6 +247,8 @@ class Renderer():
 			rendered_presentation.add_feature(feature)
 		_log.trace("Initial feature set: %s", ", ".join(sorted(feature.name for feature in rendered_presentation.features)))
 
+		self._prerender(rendered_presentation)
+
 		# Run it first to build the initial TOC and determine feature set
 		self._compute_renderable_slides(rendered_presentation)
 
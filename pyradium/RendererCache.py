@@ -20,12 +20,13 @@
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
 import os
+import zlib
 import contextlib
-import hashlib
 import datetime
 import collections
 import json
-from .ExtendedJSONEncoder import ExtendedJSONEncoder
+import xxhash
+from .ExtendedJSONEncoder import ExtendedJSONEncoder, ExtendedJSONObjects
 
 RenderedResult = collections.namedtuple("RenderedResult", [ "key", "keyhash", "from_cache", "data" ])
 
@@ -39,40 +40,109 @@ class RendererCache():
 	@staticmethod
 	def _hash_key(key):
 		binkey = ExtendedJSONEncoder.dumps(key, minify = True, sort_keys = True).encode("utf-8")
-		keyhash = hashlib.md5(binkey).hexdigest()
+		keyhash = xxhash.xxh128(binkey).hexdigest()
 		return keyhash
 
+	@classmethod
+	def _externalize_bytes(cls, obj, blob_data):
+		# Replace all bytes objects by references into a binary blob so that
+		# they do not need to be base64-encoded. Compressible data (e.g., SVG
+		# or command output) is still stored zlib compressed.
+		if isinstance(obj, bytes):
+			compressed = ExtendedJSONEncoder.compress_bytes(obj)
+			reference = {
+				"__internal_object__":	ExtendedJSONObjects.BlobReference.value,
+				"offset":				len(blob_data),
+			}
+			if compressed is not None:
+				reference["compression"] = "zlib"
+				obj = compressed
+			reference["length"] = len(obj)
+			blob_data += obj
+			return reference
+		elif isinstance(obj, list):
+			return [ cls._externalize_bytes(item, blob_data) for item in obj ]
+		elif isinstance(obj, dict):
+			return { key: cls._externalize_bytes(value, blob_data) for (key, value) in obj.items() }
+		else:
+			return obj
+
+	@classmethod
+	def _internalize_bytes(cls, obj, blob_data):
+		if isinstance(obj, list):
+			return [ cls._internalize_bytes(item, blob_data) for item in obj ]
+		elif isinstance(obj, dict):
+			if obj.get("__internal_object__") == ExtendedJSONObjects.BlobReference.value:
+				(offset, length) = (obj["offset"], obj["length"])
+				if offset + length > len(blob_data):
+					raise ValueError(f"Cache blob reference at offset {offset} with length {length} exceeds blob size of {len(blob_data)} bytes")
+				data = bytes(blob_data[offset : offset + length])
+				if obj.get("compression") == "zlib":
+					data = zlib.decompress(data)
+				return data
+			return { key: cls._internalize_bytes(value, blob_data) for (key, value) in obj.items() }
+		else:
+			return obj
+
 	def _retrieve(self, keyhash):
 		filename = self._directory + keyhash + ".json"
 		try:
 			with open(filename) as f:
 				file_representation = ExtendedJSONEncoder.load(f)
-		except (FileNotFoundError, json.decoder.JSONDecodeError):
+			if file_representation["meta"].get("blob", False):
+				with open(self._directory + keyhash + ".bin", "rb") as f:
+					blob_data = f.read()
+				object_data = self._internalize_bytes(file_representation["object"], blob_data)
+			else:
+				object_data = file_representation["object"]
+		except (FileNotFoundError, json.decoder.JSONDecodeError, ValueError, zlib.error):
 			return None
 
-		return RenderedResult(key = file_representation["key"], keyhash = keyhash, from_cache = True, data = file_representation["object"])
+		return RenderedResult(key = file_representation["key"], keyhash = keyhash, from_cache = True, data = object_data)
 
 	def _store(self, key, keyhash, object_data):
+		blob_data = bytearray()
+		object_data = self._externalize_bytes(object_data, blob_data)
 		file_representation = {
 			"key":		key,
 			"meta": {
 				"rendered":	datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
 				"keyhash":	keyhash,
+				"blob":		len(blob_data) > 0,
 			},
 			"object": object_data,
 		}
 
+		# Write the blob first; the JSON file is what makes the entry visible
+		if len(blob_data) > 0:
+			with open(self._directory + keyhash + ".bin", "wb") as f:
+				f.write(blob_data)
 		filename = self._directory + keyhash + ".json"
 		with open(filename, "w") as f:
 			ExtendedJSONEncoder.dump(file_representation, f, minify = True)
 
-	def render(self, property_dict):
-		key = {
+	def _compute_key(self, property_dict):
+		return {
 			"name":						self._renderer.name,
 			"renderer_properties":		self._renderer.properties,
 			"object_properties":		property_dict,
 			"additional_key":			self._renderer.rendering_key(property_dict),
 		}
+
+	@property
+	def batched(self):
+		return self._renderer._BATCH
+
+	def keyhash(self, property_dict):
+		return self._hash_key(self._compute_key(property_dict))
+
+	def contains(self, keyhash):
+		# Cheap check that does not parse the entry; a broken entry is still
+		# treated as a miss when it is actually retrieved
+		return os.path.isfile(self._directory + keyhash + ".json")
+
+	def render(self, property_dict):
+		key = self._compute_key(property_dict)
 		attempt_cache = property_dict.get("cache", True)
 
 		keyhash = self._hash_key(key)
@@ -84,3 +154,23 @@ class RendererCache():
 			if attempt_cache:
 				self._store(key, keyhash, object_data)
 			return RenderedResult(key = key, keyhash = keyhash, from_cache = False, data = object_data)
+
+	def render_batch(self, property_dicts):
+		results = [ None ] * len(property_dicts)
+		uncached = [ ]
+		for (index, property_dict) in enumerate(property_dicts):
+			key = self._compute_key(property_dict)
+			keyhash = self._hash_key(key)
+			cached_object = self._retrieve(keyhash) if property_dict.get("cache", True) else None
+			if cached_object is not None:
+				results[index] = cached_object
+			else:
+				uncached.append((index, key, keyhash, property_dict))
+
+		if len(uncached) > 0:
+			rendered_objects = self._renderer.render_batch([ property_dict for (index, key, keyhash, property_dict) in uncached ])
+			for ((index, key, keyhash, property_dict), object_data) in zip(uncached, rendered_objects):
+				if property_dict.get("cache", True):
+					self._store(key, keyhash, object_data)
+				results[index] = RenderedResult(key = key, keyhash = keyhash, from_cache = False, data = object_data)
+		return results
@@ -20,6 +20,7 @@
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
 import enum
+import dataclasses
 from .BaseDirective import BaseDirective
 
 class TOCElement(enum.Enum):
@@ -27,6 +28,7 @@ class TOCElement(enum.Enum):
 	Section = "section"
 	SubSection = "subsection"
 
+@dataclasses.dataclass(slots = True, frozen = True, eq = False)
 class TOCDirective(BaseDirective):
 	_TOC_LEVEL = {
 		TOCElement.Chapter:		0,
@@ -34,18 +36,11 @@ class TOCDirective(BaseDirective):
 		TOCElement.SubSection:	2,
 	}
 
-	def __init__(self, toc_element, value):
-		assert(isinstance(toc_element, TOCElement))
-		self._toc_element = toc_element
-		self._value = value
+	toc_element: TOCElement
+	value: str
 
-	@property
-	def toc_element(self):
-		return self._toc_element
-
-	@property
-	def value(self):
-		return self._value
+	def __post_init__(self):
+		assert(isinstance(self.toc_element, TOCElement))
 
 	def render(self, rendered_presentation):
 		level = self._TOC_LEVEL[self.toc_element]
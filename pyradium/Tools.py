@@ -22,10 +22,10 @@
 import os
 import sys
 import json
-import hashlib
 import tempfile
 import contextlib
 import subprocess
+import xxhash
 from pyradium.Exceptions import InvalidBooleanValueException, InvalidValueNodeException, InvalidEvalExpressionException
 
 class XMLTools():
@@ -315,7 +315,7 @@ class ImageTools():
 			return f.read()
 
 class HashTools():
-	_HASHFNC = hashlib.md5
+	_HASHFNC = xxhash.xxh128
 
 	@classmethod
 	def _update_file(cls, hashfnc, f):
@@ -326,8 +326,8 @@ class HashTools():
 			hashfnc.update(chunk)
 
 	@classmethod
-	def hash_files(cls, filenames):
-		hashfnc = HashTools._HASHFNC()
+	def hash_files(cls, filenames, hash_function = None):
+		hashfnc = (hash_function or HashTools._HASHFNC)()
 		for filename in filenames:
 			with open(filename, "rb") as f:
 				cls._update_file(hashfnc, f)
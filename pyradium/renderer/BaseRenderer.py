@@ -27,6 +27,7 @@ class BaseRenderer():
 	RendererResult = collections.namedtuple("RendererResult", [ "key", "data" ])
 	_NAME = None
 	_CACHE = True
+	_BATCH = False
 	_RENDERER_CLASSES = { }
 	_RENDERER_INSTANCES = { }
 
@@ -46,6 +47,9 @@ class BaseRenderer():
 	def render(self, property_dict):
 		raise NotImplementedError(__class__.__name__)
 
+	def render_batch(self, property_dicts):
+		return [ self.render(property_dict) for property_dict in property_dicts ]
+
 	@classmethod
 	def instanciate(cls, renderer_name, **kwargs):
 		if renderer_name not in cls._RENDERER_INSTANCES:
@@ -19,12 +19,15 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
+import logging
 import subprocess
 from pyradium.Tools import HashTools
 from pyradium.Exceptions import FailedToExecuteSubprocessException
 from pyradium.CmdlineEscape import CmdlineEscape
 from .BaseRenderer import BaseRenderer
 
+_log = logging.getLogger(__spec__.name)
+
 @BaseRenderer.register
 class ExecRenderer(BaseRenderer):
 	_NAME = "exec"
@@ -32,7 +35,7 @@ class ExecRenderer(BaseRenderer):
 	@property
 	def properties(self):
 		return {
-			"version":			1,
+			"version":			2,
 		}
 
 	def rendering_key(self, property_dict):
@@ -43,8 +46,10 @@ class ExecRenderer(BaseRenderer):
 
 	def render(self, property_dict):
 		cmd = property_dict["cmd"]
+		# Only stdout is consumed; with a single pipe, subprocess reads it in
+		# one go instead of multiplexing and joining chunks of both streams.
 		try:
-			proc = subprocess.run(cmd, stdout = subprocess.PIPE, stderr = subprocess.PIPE, check = False)
+			proc = subprocess.run(cmd, stdout = subprocess.PIPE, stderr = _log.subproc_target, check = False)
 		except PermissionError as e:
 			raise FailedToExecuteSubprocessException(f"Could not execute s:exec because of {type(e).__name__}: {CmdlineEscape().cmdline(cmd)}") from e
 
@@ -54,7 +59,6 @@ class ExecRenderer(BaseRenderer):
 		result = {
 			"cmd":			cmd,
 			"stdout":		proc.stdout,
-			"stderr":		proc.stderr,
 		}
 		return result
 
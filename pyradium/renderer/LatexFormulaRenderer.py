@@ -19,6 +19,7 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
+import io
 import json
 import tempfile
 import subprocess
@@ -31,12 +32,13 @@ from .BaseRenderer import BaseRenderer
 _log = logging.getLogger(__spec__.name)
 
 _TEX_TEMPLATE = r"""
-\documentclass[preview,border=1mm,varwidth=true]{standalone}
+\documentclass[preview,border=1mm,varwidth=true,multi=pyradiumformula]{standalone}
 \usepackage[utf8]{inputenc}
 \usepackage[T1]{fontenc}
 \usepackage{lmodern}
 \usepackage{amsmath}
 \usepackage{amssymb}
+\newenvironment{pyradiumformula}{}{}
 \begin{document}
 %(content)s
 \end{document}
@@ -45,6 +47,7 @@ _TEX_TEMPLATE = r"""
 @BaseRenderer.register
 class LatexFormulaRenderer(BaseRenderer):
 	_NAME = "latex"
+	_BATCH = True
 	_Baseline = collections.namedtuple("Baseline", [ "image_width", "image_height", "upper", "lower", "mid" ])
 
 	def __init__(self, rendering_dpi = 600):
@@ -55,112 +58,145 @@ class LatexFormulaRenderer(BaseRenderer):
 	@property
 	def properties(self):
 		return {
-			"version":			3,
+			"version":			6,
 			"rendering_dpi":	self._rendering_dpi,
 		}
 
-	def _get_baseline_info(self, png_filename, xoffset):
-		# Need 2 pixel wide sample so that ImageMagick does not return an empty image
-		crop_info = json.loads(subprocess.check_output([ "convert", "%s[2x+%d+0]" % (png_filename, xoffset), "-trim", "json:-" ]))
-
-		image_height = crop_info[0]["image"]["pageGeometry"]["height"]
-		image_width = crop_info[0]["image"]["pageGeometry"]["width"]
-		upper_baseline_y_from_top = crop_info[0]["image"]["pageGeometry"]["y"]
-		lower_baseline_y_from_top = upper_baseline_y_from_top + crop_info[0]["image"]["geometry"]["height"]
+	def _get_baseline_info(self, image, xoffset):
+		# Evaluate the bounding box of a 2 pixel wide sample of the baseline bar
+		sample_bbox = image.crop((xoffset, 0, xoffset + 2, image.height)).getbbox()
+		if sample_bbox is None:
+			raise ImageRenderingException(f"Unable to find baseline bar at x = {xoffset} in rendered formula image.")
+		upper_baseline_y_from_top = sample_bbox[1]
+		lower_baseline_y_from_top = sample_bbox[3]
 
 		# Do not choose the exact average, but skewed closer to the lower
 		# baseline
 		baseline_y_from_top = round((upper_baseline_y_from_top + 7 * lower_baseline_y_from_top) / 8)
-		return self._Baseline(image_width = image_width, image_height = image_height, upper = upper_baseline_y_from_top, lower = lower_baseline_y_from_top, mid = baseline_y_from_top)
+		return self._Baseline(image_width = image.width, image_height = image.height, upper = upper_baseline_y_from_top, lower = lower_baseline_y_from_top, mid = baseline_y_from_top)
+
+	def _get_formula_content(self, property_dict):
+		# Prepend a baseline bar which is cropped off again later on
+		baseline = r"\rule{1mm}{1pt} \hspace{2mm}"
+		if property_dict.get("long", False):
+			content = r"\[" + baseline + property_dict["formula"] + r" \]"
+		else:
+			content = r"$" + baseline + property_dict["formula"] + r"$"
+		return r"\begin{pyradiumformula}" + content + r"\end{pyradiumformula}"
+
+	def _postprocess_page(self, tex_dir, page_no, property_dict, gs_png_filename):
+		# Pillow is imported lazily since this renderer module is loaded on
+		# every startup, even by commands that never render a formula
+		import PIL.Image
+		# Crop 3mm off the left side (1mm baseline bar + 2mm space)
+		left_crop_pixel = round((3 / 25.4) * self._rendering_dpi)
+		left_crop_pixel_safe = round((2 / 25.4) * self._rendering_dpi)
+		eval_baseline_at_x = round((0.5 / 25.4) * self._rendering_dpi)
+
+		# Trim the transparent border around the Ghostscript-rendered image
+		with PIL.Image.open(gs_png_filename) as gs_image:
+			image = gs_image.convert("RGBA")
+		# Drop color profile and metadata, otherwise they would be copied into
+		# every cropped image and written out again when saving
+		image.info.clear()
+		trim_bbox = image.getbbox()
+		if trim_bbox is None:
+			raise ImageRenderingException(f"Rendered PNG image is empty for TeX formula \"{property_dict['formula']}\"")
+		image = image.crop(trim_bbox)
+
+		_log.trace("Crop on left side: %d (choosing %d to be on safe side); evaluating baseline at x = %d; page %d", left_crop_pixel, left_crop_pixel_safe, eval_baseline_at_x, page_no)
+		baseline = self._get_baseline_info(image, eval_baseline_at_x)
+		_log.trace("Baseline Y from top %d px upper, %d px lower, %d px mid (equals %d px mid from bottom)", baseline.upper, baseline.lower, baseline.mid, baseline.image_height - baseline.mid)
+
+		# Then crop the image finally and capture cropping metadata along the way
+		image = image.crop((left_crop_pixel_safe, 0, image.width, image.height))
+		crop_bbox = image.getbbox()
+		if crop_bbox is None:
+			raise ImageRenderingException(f"Postprocessing rendered formula PNG failed for TeX formula: {property_dict['formula']}")
+		image = image.crop(crop_bbox)
+		crop_meta = {
+			"x":		crop_bbox[0],
+			"y":		crop_bbox[1],
+			"width":	image.width,
+			"height":	image.height,
+		}
+		_log.trace("Crop upper left corner is at %d, %d and cropped size is %d x %d px", crop_meta["x"], crop_meta["y"], crop_meta["width"], crop_meta["height"])
+		if _log.isEnabledFor(logging.SINGLESTEP):
+			with open(tex_dir + "/processed_%d_01_crop_meta.json" % (page_no), "w") as f:
+				json.dump(crop_meta, f, indent = 4, sort_keys = True)
+			image.save(tex_dir + "/processed_%d_01_cropped.png" % (page_no))
+
+		# For debugging purposes, draw the baseline on the image
+		if self._debug_draw_baselines:
+			import PIL.ImageDraw
+			PIL.ImageDraw.Draw(image).line((0, baseline.mid, image.width, baseline.mid), fill = "red")
+			image.save(tex_dir + "/processed_%d_02_baseline.png" % (page_no))
+
+		png_buffer = io.BytesIO()
+		image.save(png_buffer, format = "PNG")
+		png_data = png_buffer.getvalue()
+
+		# Compute the shifted baseline in the cropped image
+		baseline_from_top_cropped = baseline.mid - crop_meta["y"]
+		baseline_from_bottom_cropped = crop_meta["height"] - baseline_from_top_cropped
+		_log.trace("Adapted baseline offsets for cropped image: %d px from top (equals %d px from bottom).", baseline_from_top_cropped, baseline_from_bottom_cropped)
+
+		# Return an image object
+		image = {
+			"png_data":	png_data,
+			"info": {
+				"width": crop_meta["width"],
+				"height": crop_meta["height"],
+				"baseline": baseline_from_bottom_cropped,
+			},
+		}
+		return image
 
-	def render(self, property_dict):
+	def _render_batch(self, property_dicts):
 		with tempfile.TemporaryDirectory(prefix = "pyradium_formula_") as tex_dir:
-			# Formula to PDF first using pdflatex
+			# All formulas to one multi-page PDF first using pdflatex, one
+			# formula per page
 			tex_filename = tex_dir + "/formula.tex"
 			pdf_filename = tex_dir + "/formula.pdf"
-			png_filename = tex_dir + "/formula.png"
-			gs_png_filename = tex_dir + "/formula_ghostscript.png"
-
-			# Crop 3mm off the left side (1mm baseline bar + 2mm space)
-			baseline = r"\rule{1mm}{1pt} \hspace{2mm}"
-			left_crop_pixel = round((3 / 25.4) * self._rendering_dpi)
-			left_crop_pixel_safe = round((2 / 25.4) * self._rendering_dpi)
-			eval_baseline_at_x = round((0.5 / 25.4) * self._rendering_dpi)
-
-			if property_dict.get("long", False):
-				content = r"\[" + baseline + property_dict["formula"] + r" \]"
-			else:
-				content = r"$" + baseline + property_dict["formula"] + r"$"
+
+			content = "\n".join(self._get_formula_content(property_dict) for property_dict in property_dicts)
 			with open(tex_filename, "w") as tex_file:
 				tex_file.write(_TEX_TEMPLATE % { "content": content })
-			_log.debug("Rendering TeX formula: %s in directory %s", content, tex_dir)
+			_log.debug("Rendering %d TeX formula(s): %s in directory %s", len(property_dicts), content, tex_dir)
 			try:
 				subprocess.check_call([ "pdflatex", "-interaction=nonstopmode", "-output-directory=%s" % (tex_dir), tex_filename ], stdout = _log.subproc_target, stderr = _log.subproc_target)
 			except subprocess.CalledProcessError as e:
-				raise InvalidTeXException(f"Invalid TeX in source: {property_dict['formula']}") from e
+				raise InvalidTeXException(f"Invalid TeX in source: {', '.join(property_dict['formula'] for property_dict in property_dicts)}") from e
 
 			# Then render the PDF to PNG using Ghostscript. ImageMagick's
 			# default system policy in policy.xml refuses to perform this
 			# conversion for us and if we preload a custom temporary policy
 			# file using MAGICK_CONFIGURE_PATH, it still takes the most
-			# restrictive of the union of all policy files.
-			cmd = [ "gs", "-dSAFER", f"-r{self._rendering_dpi}", "-sDEVICE=pngalpha", f"-o{gs_png_filename}", pdf_filename ]
+			# restrictive of the union of all policy files. Ghostscript emits
+			# one PNG per page, numbered starting from 1.
+			cmd = [ "gs", "-dSAFER", f"-r{self._rendering_dpi}", "-sDEVICE=pngalpha", f"-o{tex_dir}/formula_ghostscript_%d.png", pdf_filename ]
 			_log.trace("Converting PDF to PNG in %d dpi: %s", self._rendering_dpi, CmdlineEscape().cmdline(cmd))
 			try:
 				subprocess.check_call(cmd, stdout = _log.subproc_target, stderr = _log.subproc_target)
 			except subprocess.CalledProcessError as e:
-				raise ImageRenderingException(f"Rasterizing of PDF to PNG failed for TeX formula \"{property_dict['formula']}\" attempting to run: {CmdlineEscape().cmdline(cmd)}") from e
+				raise ImageRenderingException(f"Rasterizing of PDF to PNG failed for TeX formula(s) \"{', '.join(property_dict['formula'] for property_dict in property_dicts)}\" attempting to run: {CmdlineEscape().cmdline(cmd)}") from e
 
-			cmd = [ "convert", "-define", "profile:skip=ICC", "-trim", "+repage", gs_png_filename, png_filename ]
-			_log.trace("Cropping Ghostscript-rendered image: %s", CmdlineEscape().cmdline(cmd))
-			try:
-				subprocess.check_call(cmd, stdout = _log.subproc_target, stderr = _log.subproc_target)
-			except subprocess.CalledProcessError as e:
-				raise ImageRenderingException(f"Croping of PNG image failed for TeX formula \"{property_dict['formula']}\" attempting to run: {CmdlineEscape().cmdline(cmd)}") from e
-
-			_log.trace("Crop on left side: %d (choosing %d to be on safe side); evaluating baseline at x = %d; filename %s", left_crop_pixel, left_crop_pixel_safe, eval_baseline_at_x, png_filename)
-			baseline = self._get_baseline_info(png_filename, eval_baseline_at_x)
-			_log.trace("Baseline Y from top %d px upper, %d px lower, %d px mid (equals %d px mid from bottom)", baseline.upper, baseline.lower, baseline.mid, baseline.image_height - baseline.mid)
-
-			# Then crop the image finally and capture cropping metadata along the way
-			crop_meta = json.loads(subprocess.check_output([ "convert", "-crop", "+%d+0" % (left_crop_pixel_safe), "-trim", png_filename, "json:-" ]))[0]
-			cmd = [ "convert", "-crop", "+%d+0" % (left_crop_pixel_safe), "-trim", "+repage", "-strip", png_filename, "png:-" ]
-			try:
-				png_data = subprocess.check_output(cmd)
-			except subprocess.CalledProcessError as e:
-				raise ImageRenderingException(f"Postprocessing rendered formula PNG failed for TeX formula: {property_dict['formula']}") from e
-			_log.trace("Final crop to output size: %s", CmdlineEscape().cmdline(cmd))
-			if _log.isEnabledFor(logging.SINGLESTEP):
-				with open(tex_dir + "/processed_01_crop_meta.json", "w") as f:
-					json.dump(crop_meta, f, indent = 4, sort_keys = True)
-				with open(tex_dir + "/processed_01_cropped.png", "wb") as f:
-					f.write(png_data)
-
-			_log.trace("Crop upper left corner is at %d, %d and cropped size is %d x %d px", crop_meta["image"]["pageGeometry"]["x"], crop_meta["image"]["pageGeometry"]["y"], crop_meta["image"]["geometry"]["width"], crop_meta["image"]["geometry"]["height"])
-
-			# For debugging purposes, draw the baseline on the image
-			if self._debug_draw_baselines:
-				cmd = [ "convert", "-stroke", "red", "-draw", "line 0,%d %d,%d" % (baseline.mid, crop_meta["image"]["geometry"]["width"], baseline.mid) ]
-				cmd += [ "-", "png:-" ]
-				png_data = subprocess.check_output(cmd, input = png_data)
-				with open(tex_dir + "/processed_02_baseline.png", "wb") as f:
-					f.write(png_data)
-
-			# Compute the shifted baseline in the cropped image
-			baseline_from_top_cropped = baseline.mid - crop_meta["image"]["pageGeometry"]["y"]
-			baseline_from_bottom_cropped = crop_meta["image"]["geometry"]["height"] - baseline_from_top_cropped
-			_log.trace("Adapted baseline offsets for cropped image: %d px from top (equals %d px from bottom).", baseline_from_top_cropped, baseline_from_bottom_cropped)
-
-			# Return an image object
-			image = {
-				"png_data":	png_data,
-				"info": {
-					"width": crop_meta["image"]["geometry"]["width"],
-					"height": crop_meta["image"]["geometry"]["height"],
-					"baseline": baseline_from_bottom_cropped,
-				},
-			}
+			images = [ self._postprocess_page(tex_dir, page_no, property_dict, f"{tex_dir}/formula_ghostscript_{page_no}.png") for (page_no, property_dict) in enumerate(property_dicts, 1) ]
 			if _log.isEnabledFor(logging.SINGLESTEP):
 				_log.singlestep("Interrupting execution.")
 				input("Press RETURN to continue...")
-			return image
+			return images
+
+	def render_batch(self, property_dicts):
+		try:
+			return self._render_batch(property_dicts)
+		except InvalidTeXException:
+			if len(property_dicts) == 1:
+				raise
+			# A single invalid formula spoils the whole batch; render them
+			# individually so that the offending one is reported.
+			_log.debug("Batch rendering of %d TeX formulas failed, rendering individually.", len(property_dicts))
+			return [ self.render(property_dict) for property_dict in property_dicts ]
+
+	def render(self, property_dict):
+		return self._render_batch([ property_dict ])[0]
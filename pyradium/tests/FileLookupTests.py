@@ -0,0 +1,58 @@
+#	pyradium - HTML presentation/slide show generator
+#	Copyright (C) 2015-2023 Johannes Bauer
+#
+#	This file is part of pyradium.
+#
+#	pyradium is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	pyradium is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with pyradium; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import os
+import tempfile
+import unittest
+from pyradium.FileLookup import FileLookup
+from pyradium.Exceptions import FailedToLookupFileException
+
+class FileLookupTests(unittest.TestCase):
+	def _touch(self, filename):
+		os.makedirs(os.path.dirname(filename), exist_ok = True)
+		with open(filename, "w"):
+			pass
+
+	def test_lookup_order(self):
+		with tempfile.TemporaryDirectory() as dir1, tempfile.TemporaryDirectory() as dir2:
+			self._touch(dir1 + "/sub/a.txt")
+			self._touch(dir2 + "/sub/a.txt")
+			self._touch(dir2 + "/b.txt")
+			os.makedirs(dir1 + "/c.txt")
+			lookup = FileLookup([ dir1, dir2 ])
+			self.assertEqual(lookup.lookup("sub/a.txt"), dir1 + "/sub/a.txt")
+			self.assertEqual(lookup.lookup("b.txt"), dir2 + "/b.txt")
+			with self.assertRaises(FailedToLookupFileException):
+				lookup.lookup("c.txt")
+			with self.assertRaises(FailedToLookupFileException):
+				lookup.lookup("nonexistent/d.txt")
+
+	def test_file_created_after_failed_lookup(self):
+		with tempfile.TemporaryDirectory() as dir1:
+			lookup = FileLookup([ dir1 ])
+			with self.assertRaises(FailedToLookupFileException):
+				lookup.lookup("sub/a.txt")
+			self._touch(dir1 + "/sub/a.txt")
+			self.assertEqual(lookup.lookup("sub/a.txt"), dir1 + "/sub/a.txt")
+
+	def test_no_paths(self):
+		with self.assertRaises(FailedToLookupFileException):
+			FileLookup().lookup("a.txt")
@@ -0,0 +1,91 @@
+#	pyradium - HTML presentation/slide show generator
+#	Copyright (C) 2015-2023 Johannes Bauer
+#
+#	This file is part of pyradium.
+#
+#	pyradium is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	pyradium is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with pyradium; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+
+import os
+import mmap
+import types
+import tempfile
+import unittest
+import unittest.mock
+from pyradium.RenderedPresentation import RenderedPresentation
+
+class RenderedPresentationTests(unittest.TestCase):
+	def _rendered_presentation(self, directory, template_dir = None):
+		renderer = types.SimpleNamespace(
+			presentation = types.SimpleNamespace(meta = { }),
+			lookup_template_file = lambda filename: f"{template_dir}/{filename}",
+		)
+		return RenderedPresentation(renderer, deploy_directory = directory, resource_directory = directory)
+
+	def test_identical_content_hardlinked(self):
+		with tempfile.TemporaryDirectory() as directory:
+			content = os.urandom(4096)
+			rendered_presentation = self._rendered_presentation(directory)
+			rendered_presentation.add_file("imgs/a.png", content)
+			rendered_presentation.add_file("imgs/b.png", content)
+			rendered_presentation.add_file("small1.txt", b"x" * 10)
+			rendered_presentation.add_file("small2.txt", b"x" * 10)
+			self.assertTrue(os.path.samefile(directory + "/imgs/a.png", directory + "/imgs/b.png"))
+			self.assertFalse(os.path.samefile(directory + "/small1.txt", directory + "/small2.txt"))
+			with open(directory + "/imgs/b.png", "rb") as f:
+				self.assertEqual(f.read(), content)
+
+	def test_rerender_unshares(self):
+		with tempfile.TemporaryDirectory() as directory:
+			content = os.urandom(4096)
+			rendered_presentation = self._rendered_presentation(directory)
+			rendered_presentation.add_file("a.bin", content)
+			rendered_presentation.add_file("b.bin", content)
+
+			# Second render into the same directory changes only one of the
+			# previously hardlinked files
+			new_content = os.urandom(4096)
+			rendered_presentation = self._rendered_presentation(directory)
+			rendered_presentation.add_file("b.bin", new_content)
+			with open(directory + "/a.bin", "rb") as f:
+				self.assertEqual(f.read(), content)
+			with open(directory + "/b.bin", "rb") as f:
+				self.assertEqual(f.read(), new_content)
+			self.assertEqual(os.stat(directory + "/a.bin").st_nlink, 1)
+
+	def test_copy_file_hardlinked(self):
+		with tempfile.TemporaryDirectory() as template_dir, tempfile.TemporaryDirectory() as directory:
+			content = os.urandom(4096)
+			with open(template_dir + "/style.css", "wb") as f:
+				f.write(content)
+			rendered_presentation = self._rendered_presentation(directory, template_dir = template_dir)
+			rendered_presentation.add_file("first.css", content)
+			with unittest.mock.patch("mmap.mmap", wraps = mmap.mmap) as mmap_mock:
+				rendered_presentation.copy_file("style.css", target_directory = "/template/")
+			mmap_mock.assert_called_once()
+			self.assertTrue(os.path.samefile(directory + "/first.css", directory + "/template/style.css"))
+
+	def test_hash_collision_not_linked(self):
+		with tempfile.TemporaryDirectory() as directory:
+			rendered_presentation = self._rendered_presentation(directory)
+			(content1, content2) = (os.urandom(4096), os.urandom(4096))
+			with unittest.mock.patch("xxhash.xxh128_intdigest", return_value = 0):
+				rendered_presentation.add_file("a.bin", content1)
+				rendered_presentation.add_file("b.bin", content2)
+			self.assertFalse(os.path.samefile(directory + "/a.bin", directory + "/b.bin"))
+			with open(directory + "/b.bin", "rb") as f:
+				self.assertEqual(f.read(), content2)
@@ -19,10 +19,80 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
+import io
+import os
+import re
+import tempfile
+import contextlib
+import subprocess
 import unittest
+import unittest.mock
+import PIL.Image
+import PIL.ImageDraw
 from pyradium.renderer import BaseRenderer
+from pyradium.renderer.LatexFormulaRenderer import LatexFormulaRenderer
+from pyradium.RendererCache import RendererCache
+from pyradium.Exceptions import InvalidTeXException
 
 class RendererTests(unittest.TestCase):
+	class _BlobRenderer(BaseRenderer):
+		_NAME = "unittest_blob"
+
+		def render(self, property_dict):
+			return {
+				"text":		property_dict["text"],
+				"data":		property_dict["text"].encode("utf-8") * 1000,
+				"parts":	[ b"", b"\x00\xff", { "nested": b"foo" } ],
+			}
+
+	class _BatchRecordingRenderer(BaseRenderer):
+		_NAME = "unittest_batch"
+
+		def __init__(self):
+			super().__init__()
+			self.batches = [ ]
+
+		def render(self, property_dict):
+			return { "text": property_dict["text"].upper() }
+
+		def render_batch(self, property_dicts):
+			self.batches.append([ property_dict["text"] for property_dict in property_dicts ])
+			return super().render_batch(property_dicts)
+
+	@contextlib.contextmanager
+	def _temporary_cache(self):
+		# Keep cache entries created by tests out of the user's cache directory
+		with tempfile.TemporaryDirectory(prefix = "pyradium_test_") as home, unittest.mock.patch.dict(os.environ, { "HOME": home }):
+			yield home
+
+	@staticmethod
+	def _formula_png(filename, width, **kwargs):
+		# Mimics a transparent Ghostscript page at 100 dpi: a baseline bar on
+		# the left (rows 20-22), then the formula itself with the given width
+		image = PIL.Image.new("RGBA", (60 + width, 60))
+		draw = PIL.ImageDraw.Draw(image)
+		draw.rectangle((5, 20, 8, 22), fill = "black")
+		draw.rectangle((20, 10, 20 + width - 1, 40), fill = "black")
+		image.save(filename, **kwargs)
+
+	def _fake_tex_tools(self, calls):
+		# Stands in for pdflatex and Ghostscript; pdflatex fails for any
+		# formula containing "invalid", Ghostscript emits one page per formula
+		# whose width is given by the formula text.
+		def check_call(cmd, **kwargs):
+			tex_dir = os.path.dirname(cmd[-1])
+			with open(tex_dir + "/formula.tex") as f:
+				formulas = re.findall(r"\\hspace\{2mm\}(.*?)\$", f.read())
+			calls.append((cmd[0], formulas))
+			if cmd[0] == "pdflatex":
+				if any("invalid" in formula for formula in formulas):
+					raise subprocess.CalledProcessError(1, cmd)
+			elif cmd[0] == "gs":
+				output_pattern = [ arg for arg in cmd if arg.startswith("-o") ][0][2:]
+				for (page_no, formula) in enumerate(formulas, 1):
+					self._formula_png(output_pattern % (page_no), int(formula))
+		return unittest.mock.patch("subprocess.check_call", side_effect = check_call)
+
 	def test_dtg1(self):
 		renderer = BaseRenderer.instanciate("dtg")
 		renderer.render({
@@ -38,3 +108,101 @@ class RendererTests(unittest.TestCase):
 			"marker_extend": 20,
 			"clock_ticks": True,
 		})
+
+	def test_cache_blob_roundtrip(self):
+		with self._temporary_cache():
+			renderer = RendererCache(self._BlobRenderer())
+			property_dict = { "text": "pyradium " + os.urandom(8).hex() }
+			rendered = renderer.render(property_dict)
+			self.assertFalse(rendered.from_cache)
+			cached = renderer.render(property_dict)
+			self.assertTrue(cached.from_cache)
+			self.assertEqual(cached.keyhash, rendered.keyhash)
+			self.assertEqual(cached.data, rendered.data)
+
+			# The repetitive payload is stored compressed
+			blob_filename = renderer._directory + rendered.keyhash + ".bin"
+			self.assertLess(os.stat(blob_filename).st_size, len(rendered.data["data"]) / 10)
+
+	def test_cache_contains(self):
+		with self._temporary_cache():
+			renderer = RendererCache(self._BlobRenderer())
+			property_dict = { "text": "pyradium" }
+			keyhash = renderer.keyhash(property_dict)
+			self.assertFalse(renderer.contains(keyhash))
+			self.assertEqual(renderer.render(property_dict).keyhash, keyhash)
+			self.assertTrue(renderer.contains(keyhash))
+
+	def test_cache_broken_blob(self):
+		with self._temporary_cache():
+			renderer = RendererCache(self._BlobRenderer())
+			property_dict = { "text": "pyradium" }
+			rendered = renderer.render(property_dict)
+			blob_filename = renderer._directory + rendered.keyhash + ".bin"
+
+			# A truncated blob is treated as a cache miss and rewritten
+			with open(blob_filename, "r+b") as f:
+				f.truncate(os.stat(blob_filename).st_size // 2)
+			result = renderer.render(property_dict)
+			self.assertFalse(result.from_cache)
+			self.assertEqual(result.data, rendered.data)
+			self.assertTrue(renderer.render(property_dict).from_cache)
+
+			# So is a missing one
+			os.unlink(blob_filename)
+			result = renderer.render(property_dict)
+			self.assertFalse(result.from_cache)
+			self.assertEqual(result.data, rendered.data)
+			self.assertTrue(renderer.render(property_dict).from_cache)
+
+	def test_latex_batch_page_order(self):
+		calls = [ ]
+		renderer = LatexFormulaRenderer(rendering_dpi = 100)
+		with self._fake_tex_tools(calls):
+			images = renderer.render_batch([ { "formula": "30" }, { "formula": "10" }, { "formula": "20" } ])
+		self.assertEqual(calls, [ ("pdflatex", [ "30", "10", "20" ]), ("gs", [ "30", "10", "20" ]) ])
+		self.assertEqual([ image["info"]["width"] for image in images ], [ 30, 10, 20 ])
+		self.assertEqual([ image["info"]["height"] for image in images ], [ 31, 31, 31 ])
+
+	def test_latex_batch_fallback(self):
+		calls = [ ]
+		renderer = LatexFormulaRenderer(rendering_dpi = 100)
+		with self._fake_tex_tools(calls), self.assertRaises(InvalidTeXException):
+			renderer.render_batch([ { "formula": "10" }, { "formula": "invalid" }, { "formula": "20" } ])
+		# The failed batch is retried formula by formula, stopping at the
+		# offending one
+		self.assertEqual(calls, [
+			("pdflatex", [ "10", "invalid", "20" ]),
+			("pdflatex", [ "10" ]),
+			("gs", [ "10" ]),
+			("pdflatex", [ "invalid" ]),
+		])
+
+	def test_cache_render_batch(self):
+		with self._temporary_cache():
+			batch_renderer = self._BatchRecordingRenderer()
+			renderer = RendererCache(batch_renderer)
+			renderer.render({ "text": "cached" })
+			results = renderer.render_batch([ { "text": "new" }, { "text": "cached" }, { "text": "uncacheable", "cache": False }, { "text": "other" } ])
+			self.assertEqual(batch_renderer.batches, [ [ "new", "uncacheable", "other" ] ])
+			self.assertEqual([ result.data["text"] for result in results ], [ "NEW", "CACHED", "UNCACHEABLE", "OTHER" ])
+			self.assertEqual([ result.from_cache for result in results ], [ False, True, False, False ])
+
+			# Everything except the uncacheable object is now a cache hit
+			results = renderer.render_batch([ { "text": "other" }, { "text": "uncacheable", "cache": False }, { "text": "new" } ])
+			self.assertEqual(batch_renderer.batches[1 : ], [ [ "uncacheable" ] ])
+			self.assertEqual([ result.from_cache for result in results ], [ True, False, True ])
+
+	def test_latex_postprocess_page(self):
+		renderer = LatexFormulaRenderer(rendering_dpi = 100)
+		with tempfile.TemporaryDirectory(prefix = "pyradium_test_") as tex_dir:
+			png_filename = tex_dir + "/page.png"
+			self._formula_png(png_filename, 25, icc_profile = b"not really an ICC profile", dpi = (100, 100))
+			image = renderer._postprocess_page(tex_dir, 1, { "formula": "x" }, png_filename)
+		# Baseline bar ends at row 22 of a formula spanning rows 10-40
+		self.assertEqual(image["info"], { "width": 25, "height": 31, "baseline": 18 })
+		self.assertNotIn(b"iCCP", image["png_data"])
+		self.assertNotIn(b"pHYs", image["png_data"])
+		with PIL.Image.open(io.BytesIO(image["png_data"])) as png:
+			self.assertEqual(png.size, (25, 31))
+			self.assertEqual(png.mode, "RGBA")
@@ -19,11 +19,29 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
+import os
+import types
+import tempfile
 import unittest
 import xml.dom.minidom
+from pysvgedit.Exceptions import SVGValidationException
 from pyradium.xmlhooks.XMLHookRegistry import XMLHookRegistry
+from pyradium.xmlhooks.ImgHook import ImgHook
 
 class XMLHookTests(unittest.TestCase):
+	class _CountingImgRenderer():
+		def __init__(self):
+			self.render_count = 0
+
+		def render(self, property_dict):
+			self.render_count += 1
+			return (self.render_count, property_dict)
+
+	def _fake_rendered_presentation(self, custom_renderer):
+		renderer = types.SimpleNamespace(get_custom_renderer = lambda name: custom_renderer)
+		memos = { }
+		return types.SimpleNamespace(renderer = renderer, get_memo = lambda name: memos.setdefault(name, { }))
+
 	def _parse(self, xmltext):
 		doc = xml.dom.minidom.parseString(f"<?xml version=\"1.0\"?><slide xmlns:s=\"https://github.com/johndoe31415/pyradium\">{xmltext}</slide>")
 		slide = doc.childNodes[0]
@@ -53,3 +71,62 @@ class XMLHookTests(unittest.TestCase):
 		node = self._parse("foo <!-- comment -->bar")
 		XMLHookRegistry.mangle(rendered_presentation = None, root_node = node)
 		self.assertEqual(node.toxml(), "<slide xmlns:s=\"https://github.com/johndoe31415/pyradium\">foo bar</slide>")
+
+	def test_prerender_requests(self):
+		node = self._parse("foo <s:tex>x^2</s:tex> <s:enq type=\"bkt\"><s:tex long=\"1\">y</s:tex></s:enq>")
+		requests = XMLHookRegistry.prerender_requests(rendered_presentation = None, root_node = node)
+		self.assertEqual(requests, [ ("latex", { "formula": "x^2", "long": False }), ("latex", { "formula": "y", "long": True }) ])
+		self.assertEqual(node.toxml(), "<slide xmlns:s=\"https://github.com/johndoe31415/pyradium\">foo <s:tex>x^2</s:tex> <s:enq type=\"bkt\"><s:tex long=\"1\">y</s:tex></s:enq></slide>")
+
+	def test_img_render_memo(self):
+		img_renderer = self._CountingImgRenderer()
+		rendered_presentation = self._fake_rendered_presentation(img_renderer)
+		with tempfile.NamedTemporaryFile(suffix = ".png") as f:
+			properties = { "max_dimension": 1920, "src": f.name }
+			first = ImgHook._render(rendered_presentation, properties)
+			self.assertEqual(ImgHook._render(rendered_presentation, dict(properties)), first)
+			self.assertEqual(img_renderer.render_count, 1)
+
+			# A modified source file must be rendered again
+			statres = os.stat(f.name)
+			os.utime(f.name, ns = (statres.st_atime_ns, statres.st_mtime_ns + 1000000000))
+			self.assertNotEqual(ImgHook._render(rendered_presentation, properties), first)
+			self.assertEqual(img_renderer.render_count, 2)
+
+			# Literal images are distinguished by their content
+			literal = { "max_dimension": 1920, "value": b"<svg/>", "filetype": "svg" }
+			rendered_literal = ImgHook._render(rendered_presentation, literal)
+			self.assertEqual(ImgHook._render(rendered_presentation, dict(literal)), rendered_literal)
+			self.assertEqual(img_renderer.render_count, 3)
+			ImgHook._render(rendered_presentation, dict(literal, value = b"<svg></svg>"))
+			self.assertEqual(img_renderer.render_count, 4)
+
+		# Memoized images do not outlive a rendering
+		ImgHook._render(self._fake_rendered_presentation(img_renderer), literal)
+		self.assertEqual(img_renderer.render_count, 5)
+
+	def test_terminal_prompt(self):
+		node = self._parse("<s:term prompt=\"\\$ \">$ ls\nfoo\n$ echo a \\\n  b\nout\n$ last\n</s:term>")
+		XMLHookRegistry.mangle(rendered_presentation = None, root_node = node)
+		self.assertEqual(node.toxml(), "<slide xmlns:s=\"https://github.com/johndoe31415/pyradium\"><pre class=\"terminal\">$ <span class=\"command\">ls</span>\nfoo\n$ <span class=\"command\">echo a \\\n  b</span>\nout\n$ <span class=\"command\">last</span></pre></slide>")
+
+		# Consecutive regular text ends up in a single text node
+		terminal = node.childNodes[0]
+		self.assertEqual([ child.nodeType for child in terminal.childNodes ], [ node.TEXT_NODE, node.ELEMENT_NODE ] * 3)
+
+	def test_img_prerender_skips_invalid_svg(self):
+		class RejectingValidator():
+			def validate(self, doc):
+				raise SVGValidationException("rejected")
+
+		with tempfile.TemporaryDirectory() as include_dir:
+			with open(include_dir + "/image.svg", "w") as f:
+				f.write("<svg xmlns=\"http://www.w3.org/2000/svg\" width=\"10\" height=\"10\"/>")
+			rendering_params = types.SimpleNamespace(image_max_dimension = 1920, svg_validator = RejectingValidator())
+			renderer = types.SimpleNamespace(rendering_params = rendering_params, lookup_include = lambda filename: include_dir + "/" + filename)
+			rendered_presentation = types.SimpleNamespace(renderer = renderer)
+			node = self._parse("<s:img src=\"image.svg\"/>")
+			self.assertEqual(XMLHookRegistry.prerender_requests(rendered_presentation, node), [ ])
+
+			rendering_params.svg_validator = types.SimpleNamespace(validate = lambda doc: None)
+			self.assertEqual(XMLHookRegistry.prerender_requests(rendered_presentation, node), [ ("img", { "max_dimension": 1920, "src": include_dir + "/image.svg" }) ])
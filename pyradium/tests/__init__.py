@@ -26,3 +26,5 @@ from .BooleanExpressionTests import BooleanExpressionTests
 from .RendererTests import RendererTests
 from .VariableSubstitutionTests import VariableSubstitutionTests
 from .XMLHookTests import XMLHookTests
+from .FileLookupTests import FileLookupTests
+from .RenderedPresentationTests import RenderedPresentationTests
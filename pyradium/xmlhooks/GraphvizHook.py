@@ -26,10 +26,18 @@ class GraphvizHook(BaseHook):
 	_TAG_NAME = "graphviz"
 
 	@classmethod
-	def handle(cls, rendered_presentation, node):
-		properties = {
+	def _get_properties(cls, rendered_presentation, node):
+		return {
 			"src":				rendered_presentation.renderer.lookup_include(node.getAttribute("src")),
 		}
+
+	@classmethod
+	def prerender_requests(cls, rendered_presentation, node):
+		return [ ("graphviz", cls._get_properties(rendered_presentation, node)) ]
+
+	@classmethod
+	def handle(cls, rendered_presentation, node):
+		properties = cls._get_properties(rendered_presentation, node)
 		graphviz_renderer = rendered_presentation.renderer.get_custom_renderer("graphviz")
 		rendered_graph = graphviz_renderer.render(properties)
 		local_filename = f"imgs/graphviz/{rendered_graph.keyhash}.{rendered_graph.data['extension']}"
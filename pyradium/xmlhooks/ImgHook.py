@@ -19,10 +19,12 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
+import os
 from pysvgedit import SVGDocument
 from pysvgedit.Exceptions import SVGValidationException
 from pyradium.xmlhooks.XMLHookRegistry import BaseHook, XMLHookRegistry, ReplacementFragment
-from pyradium.Tools import XMLTools
+from pyradium.Tools import XMLTools, HashTools
+from pyradium.ExtendedJSONEncoder import ExtendedJSONEncoder
 from pyradium.Exceptions import InvalidTransformationException, MalformedXMLInputException, MalformedImageException
 
 @XMLHookRegistry.register_hook
@@ -58,7 +60,7 @@ class ImgHook(BaseHook):
 		return transformations
 
 	@classmethod
-	def handle(cls, rendered_presentation, node):
+	def _get_properties(cls, rendered_presentation, node):
 		transformations = cls._parse_transformations(node)
 
 		if node.hasAttribute("src") and node.hasAttribute("value"):
@@ -72,14 +74,7 @@ class ImgHook(BaseHook):
 			"max_dimension":	rendered_presentation.renderer.rendering_params.image_max_dimension,
 		}
 		if node.hasAttribute("src"):
-			filename = rendered_presentation.renderer.lookup_include(node.getAttribute("src"))
-			properties["src"] = filename
-			if filename.lower().endswith(".svg"):
-				doc = SVGDocument.read(filename)
-				try:
-					rendered_presentation.renderer.rendering_params.svg_validator.validate(doc)
-				except SVGValidationException as e:
-					raise MalformedImageException(f"SVG image {filename} did not pass SVG validation: {str(e)}") from e
+			properties["src"] = rendered_presentation.renderer.lookup_include(node.getAttribute("src"))
 		else:
 			# Literal specification as value
 			properties["value"] = node.getAttribute("value").encode("utf-8")
@@ -89,8 +84,58 @@ class ImgHook(BaseHook):
 
 		if len(transformations) > 0:
 			properties["svg_transform"] = transformations
+		return properties
+
+	@classmethod
+	def _validate_svg(cls, rendered_presentation, properties):
+		if ("src" in properties) and properties["src"].lower().endswith(".svg"):
+			filename = properties["src"]
+			doc = SVGDocument.read(filename)
+			try:
+				rendered_presentation.renderer.rendering_params.svg_validator.validate(doc)
+			except SVGValidationException as e:
+				raise MalformedImageException(f"SVG image {filename} did not pass SVG validation: {str(e)}") from e
+
+	@classmethod
+	def prerender_requests(cls, rendered_presentation, node):
+		# Invalid SVGs must not be rendered (and cached) either, since they are
+		# rejected when the hook is handled
+		properties = cls._get_properties(rendered_presentation, node)
+		cls._validate_svg(rendered_presentation, properties)
+		return [ ("img", properties) ]
+
+	@classmethod
+	def _render(cls, rendered_presentation, properties):
+		memo_properties = dict(properties)
+		if "value" in memo_properties:
+			# The encoder would compress literal image data (e.g., QR code
+			# SVGs) on every probe, a hash of it is much cheaper
+			memo_properties["value"] = HashTools.hash_data(memo_properties["value"])
+		# The same image is handled in every slide pass (and possibly in many
+		# places). Remember rendered images for the current rendering by their
+		# properties together with the source file's stat() signature so that
+		# sources modified in the meantime are picked up.
+		memo = rendered_presentation.get_memo("img")
+		memo_key = ExtendedJSONEncoder.dumps(memo_properties, minify = True, sort_keys = True)
+		if "src" in properties:
+			statres = os.stat(properties["src"])
+			signature = (statres.st_mtime_ns, statres.st_size)
+		else:
+			signature = None
+		memo_entry = memo.get(memo_key)
+		if (memo_entry is not None) and (memo_entry[0] == signature):
+			return memo_entry[1]
+
+		cls._validate_svg(rendered_presentation, properties)
 		img_renderer = rendered_presentation.renderer.get_custom_renderer("img")
 		rendered_image = img_renderer.render(properties)
+		memo[memo_key] = (signature, rendered_image)
+		return rendered_image
+
+	@classmethod
+	def handle(cls, rendered_presentation, node):
+		properties = cls._get_properties(rendered_presentation, node)
+		rendered_image = cls._render(rendered_presentation, properties)
 		local_filename = "imgs/img/%s.%s" % (rendered_image.keyhash, rendered_image.data["extension"])
 		uri = "%simgs/img/%s.%s" % (rendered_presentation.renderer.rendering_params.resource_uri, rendered_image.keyhash, rendered_image.data["extension"])
 
@@ -26,11 +26,19 @@ class PlotHook(BaseHook):
 	_TAG_NAME = "plot"
 
 	@classmethod
-	def handle(cls, rendered_presentation, node):
-		properties = {
+	def _get_properties(cls, rendered_presentation, node):
+		return {
 			"src":				rendered_presentation.renderer.lookup_include(node.getAttribute("src")),
 			"max_dimension":	rendered_presentation.renderer.rendering_params.image_max_dimension,
 		}
+
+	@classmethod
+	def prerender_requests(cls, rendered_presentation, node):
+		return [ ("plot", cls._get_properties(rendered_presentation, node)) ]
+
+	@classmethod
+	def handle(cls, rendered_presentation, node):
+		properties = cls._get_properties(rendered_presentation, node)
 		plot_renderer = rendered_presentation.renderer.get_custom_renderer("plot")
 		rendered_plot = plot_renderer.render(properties)
 		local_filename = "imgs/plot/%s.%s" % (rendered_plot.keyhash, rendered_plot.data["extension"])
@@ -27,15 +27,21 @@ class QRCodeHook(BaseHook):
 	_TAG_NAME = "qrcode"
 
 	@classmethod
-	def handle(cls, rendered_presentation, node):
+	def _get_properties(cls, node):
 		# Text to render
-		text = XMLTools.inner_text(node)
+		return {
+			"data": XMLTools.inner_text(node),
+		}
+
+	@classmethod
+	def prerender_requests(cls, rendered_presentation, node):
+		return [ ("qrcode", cls._get_properties(node)) ]
 
+	@classmethod
+	def handle(cls, rendered_presentation, node):
 		# Render QR-code to SVG
 		qrcode_renderer = rendered_presentation.renderer.get_custom_renderer("qrcode")
-		qrcode_svg = qrcode_renderer.render({
-			"data": text,
-		})
+		qrcode_svg = qrcode_renderer.render(cls._get_properties(node))
 
 		replacement_node = node.ownerDocument.createElement("s:img")
 		replacement_node.setAttribute("value", qrcode_svg.data["svg"].decode())
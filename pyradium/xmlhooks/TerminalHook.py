@@ -36,25 +36,33 @@ class TerminalHook(InnerTextHook):
 			regex = re.compile(prompt)
 			lines = text.splitlines(keepends = True)
 
-			while len(lines) > 0:
-				line = lines.pop(0)
+			# Consecutive regular text (including the prompt characters
+			# themselves) is collected and emitted as a single text node
+			pending_text = [ ]
+			def flush_pending_text():
+				if len(pending_text) > 0:
+					replacement_node.appendChild(node.ownerDocument.createTextNode("".join(pending_text)))
+					pending_text.clear()
+
+			index = 0
+			while index < len(lines):
+				line = lines[index]
+				index += 1
 				rematch = regex.match(line)
 				if rematch is None:
 					# No prompt found, just add the line as regular text
-					replacement_node.appendChild(node.ownerDocument.createTextNode(line))
+					pending_text.append(line)
 					continue
 
 				# Prompt found, extract the text
 				command = line[rematch.span()[1] : ]
-
-				# Create a text node that contains the prompt characters itself
-				replacement_node.appendChild(node.ownerDocument.createTextNode(line[ : rematch.span()[1]]))
+				pending_text.append(line[ : rematch.span()[1]])
 
 				# Append all lines of the command until we're finished (there
 				# are no more continuations)
-				while command.rstrip().endswith("\\") and (len(lines) > 0):
-					line = lines.pop(0)
-					command += line
+				while command.rstrip().endswith("\\") and (index < len(lines)):
+					command += lines[index]
+					index += 1
 
 				# If there is a trailing newline, we do not want this inside
 				# the <span> or otherwise the pasted output on the terminal
@@ -63,6 +71,7 @@ class TerminalHook(InnerTextHook):
 				command = command.rstrip("\n")
 
 				# Now create the command node and append it
+				flush_pending_text()
 				command_node = replacement_node.appendChild(node.ownerDocument.createElement("span"))
 				command_node.setAttribute("class", "command")
 				command_node.appendChild(node.ownerDocument.createTextNode(command))
@@ -70,7 +79,8 @@ class TerminalHook(InnerTextHook):
 				if has_trailing_nl:
 					# In this case we need to insert the newline back into the
 					# "normal" (non-copied) text.
-					replacement_node.appendChild(node.ownerDocument.createTextNode("\n"))
+					pending_text.append("\n")
+			flush_pending_text()
 		else:
 			replacement_node.appendChild(node.ownerDocument.createTextNode(text))
 
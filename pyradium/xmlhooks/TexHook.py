@@ -28,11 +28,19 @@ class TexHook(BaseHook):
 	_TAG_NAME = "tex"
 
 	@classmethod
-	def handle(cls, rendered_presentation, node):
-		properties = {
+	def _get_properties(cls, node):
+		return {
 			"formula":	XMLTools.inner_text(node),
 			"long":		XMLTools.get_bool_attr(node, "long"),
 		}
+
+	@classmethod
+	def prerender_requests(cls, rendered_presentation, node):
+		return [ ("latex", cls._get_properties(node)) ]
+
+	@classmethod
+	def handle(cls, rendered_presentation, node):
+		properties = cls._get_properties(node)
 		if node.hasAttribute("scale"):
 			user_scale = float(node.getAttribute("scale"))
 		else:
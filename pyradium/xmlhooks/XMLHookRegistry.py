@@ -22,7 +22,7 @@
 import logging
 import textwrap
 import dataclasses
-from pyradium.Exceptions import XMLHookRegistryException
+from pyradium.Exceptions import PyRadiumException, XMLHookRegistryException
 from pyradium.Tools import XMLTools
 
 _log = logging.getLogger(__spec__.name)
@@ -84,6 +84,24 @@ class XMLHookRegistry():
 				XMLTools.remove_node(node)
 		XMLTools.walk(root_node, callback)
 
+	@classmethod
+	def prerender_requests(cls, rendered_presentation, root_node):
+		# Collect all (renderer name, property dict) tuples which hooks would
+		# request from custom renderers, without modifying the DOM. Hooks that
+		# cannot determine their properties in advance are skipped; they will
+		# raise an error later on when they are actually handled.
+		requests = [ ]
+		def callback(node):
+			if node.nodeName.startswith("s:"):
+				hook_class = cls._HOOKS.get(node.nodeName[2:])
+				if hook_class is not None:
+					try:
+						requests.extend(hook_class.prerender_requests(rendered_presentation, node))
+					except PyRadiumException as e:
+						_log.trace("Not prerendering %s hook: [%s] %s", hook_class._TAG_NAME, e.__class__.__name__, str(e))
+		XMLTools.walk_elements(root_node, callback)
+		return requests
+
 
 @dataclasses.dataclass
 class ReplacementFragment():
@@ -100,6 +118,10 @@ class ReplacementFragment():
 class BaseHook():
 	_TAG_NAME = None
 
+	@classmethod
+	def prerender_requests(cls, rendered_presentation, node):
+		return [ ]
+
 	@classmethod
 	def handle(cls, rendered_presentation, node):
 		raise NotImplementedError("%s.handle" % (cls.__name__))
@@ -22,6 +22,8 @@ setuptools.setup(
 		"requests",
 		"lzstr>=0.0.3",
 		"pysvgedit>=0.0.3",
+		"xxhash",
+		"Pillow",
 	],
 	entry_points = {
 		"console_scripts": [